@@ -0,0 +1,240 @@
+"""
+Токенизатор на numba для `main.Parser._tokenize_numba`.
+
+Модуль импортируется лениво и только для больших входов: импорт numba
+сам по себе занимает заметное время. Ядра не замыкают переменные
+и используют только константы модуля, поэтому `cache=True` сохраняет
+скомпилированный код между запусками.
+"""
+
+from typing import Any
+
+import numpy as np
+from numba import njit
+
+# Должны совпадать с K_* в main.py, main сверяет KIND_NAMES перед использованием
+(
+    K_NUMBER,
+    K_STRING,
+    K_ID,
+    K_ASSIGN,
+    K_SEMICOLON,
+    K_BEGIN,
+    K_END,
+    K_IS,
+    K_PIPE,
+    K_PLUS,
+    K_MINUS,
+    K_TIMES,
+    K_LPAREN,
+    K_RPAREN,
+    K_ORD,
+) = range(15)
+KIND_NAMES = (
+    "NUMBER",
+    "STRING",
+    "ID",
+    "ASSIGN",
+    "SEMICOLON",
+    "BEGIN",
+    "END",
+    "IS",
+    "PIPE",
+    "PLUS",
+    "MINUS",
+    "TIMES",
+    "LPAREN",
+    "RPAREN",
+    "ORD",
+)
+
+# Коды ASCII-символов, с которыми сравнивает автомат
+_SPACE = ord(" ")
+_TAB = ord("\t")
+_CARRIAGE_RETURN = ord("\r")
+_FILE_SEPARATOR = 0x1C  # \x1c-\x1f тоже пробельные для str.isspace()
+_UNIT_SEPARATOR = 0x1F
+_NEWLINE = ord("\n")
+_SEMICOLON = ord(";")
+_PIPE = ord("|")
+_TIMES = ord("*")
+_LPAREN = ord("(")
+_RPAREN = ord(")")
+_PLUS = ord("+")
+_MINUS = ord("-")
+_COLON = ord(":")
+_EQUALS = ord("=")
+_DIGIT_0 = ord("0")
+_DIGIT_9 = ord("9")
+_UPPER_A = ord("A")
+_UPPER_Z = ord("Z")
+_UNDERSCORE = ord("_")
+_LOWER_Q = ord("q")
+_BEGIN = b"begin"
+_END = b"end"
+_IS = b"is"
+_ORD = b"ord"
+
+
+@njit(cache=True)
+def _is_space(c: int) -> bool:
+    """Пробельный символ ASCII в смысле str.isspace()."""
+    return (
+        c == _SPACE
+        or _TAB <= c <= _CARRIAGE_RETURN
+        or _FILE_SEPARATOR <= c <= _UNIT_SEPARATOR
+    )
+
+
+@njit(cache=True)
+def _is_digit(c: int) -> bool:
+    return _DIGIT_0 <= c <= _DIGIT_9
+
+
+@njit(cache=True)
+def _is_id_start(c: int) -> bool:
+    return _UPPER_A <= c <= _UPPER_Z or c == _UNDERSCORE
+
+
+@njit(cache=True)
+def _startswith(buf: Any, i: int, word: bytes) -> bool:
+    """Начинается ли `buf` с `word` в позиции `i`."""
+    m = len(word)
+    if i + m > buf.shape[0]:
+        return False
+    j = 0
+    while j < m and buf[i + j] == word[j]:
+        j += 1
+    return j == m
+
+
+@njit(cache=True)
+def _single_char_kind(c: int) -> int:
+    """Тип односимвольного токена или -1."""
+    kind = -1
+    if c == _SEMICOLON:
+        kind = K_SEMICOLON
+    elif c == _PIPE:
+        kind = K_PIPE
+    elif c == _TIMES:
+        kind = K_TIMES
+    elif c == _LPAREN:
+        kind = K_LPAREN
+    elif c == _RPAREN:
+        kind = K_RPAREN
+    elif c == _PLUS:
+        kind = K_PLUS
+    elif c == _MINUS:
+        kind = K_MINUS
+    return kind
+
+
+@njit(cache=True)
+def _keyword_at(buf: Any, i: int) -> tuple[int, int]:
+    """Тип и длина ключевого слова в позиции `i` или (-1, 0)."""
+    if _startswith(buf, i, _BEGIN):
+        return K_BEGIN, len(_BEGIN)
+    if _startswith(buf, i, _END):
+        return K_END, len(_END)
+    if _startswith(buf, i, _IS):
+        return K_IS, len(_IS)
+    if _startswith(buf, i, _ORD):
+        return K_ORD, len(_ORD)
+    return -1, 0
+
+
+@njit(cache=True)
+def _scan_while_id(buf: Any, i: int) -> int:
+    """Конец имени, продолжающегося с позиции `i`."""
+    n = buf.shape[0]
+    while i < n and (_is_id_start(buf[i]) or _is_digit(buf[i])):
+        i += 1
+    return i
+
+
+@njit(cache=True)
+def _scan_while_digit(buf: Any, i: int) -> int:
+    """Конец цифр, продолжающихся с позиции `i`."""
+    n = buf.shape[0]
+    while i < n and _is_digit(buf[i]):
+        i += 1
+    return i
+
+
+@njit(cache=True)
+def _string_end(buf: Any, i: int) -> int:
+    """
+    Позиция ')' строки `q(...)`, начинающейся в `i`, или -1.
+    Строка заканчивается первой ')' в пределах той же строки текста.
+    """
+    n = buf.shape[0]
+    if i + 1 >= n or buf[i] != _LOWER_Q or buf[i + 1] != _LPAREN:
+        return -1
+    j = i + 2
+    while j < n and buf[j] != _RPAREN and buf[j] != _NEWLINE:
+        j += 1
+    if j == n or buf[j] != _RPAREN:
+        return -1
+    return j
+
+
+@njit(cache=True)
+def _next_token(buf: Any, i: int) -> tuple[int, int, int, int]:
+    """
+    Разбирает токен, начинающийся в непробельной позиции `i`.
+
+    :return: Тип токена (-1 для недопустимого символа), начало и конец
+        его значения и позиция сразу за токеном.
+    """
+    n = buf.shape[0]
+    c = buf[i]
+    # Знак перед цифрой относится к числу, а не к оператору
+    signed = c in (_PLUS, _MINUS) and i + 1 < n and _is_digit(buf[i + 1])
+    if _is_digit(c) or signed:
+        end = _scan_while_digit(buf, i + 1)
+        return K_NUMBER, i, end, end
+    kind = _single_char_kind(c)
+    if kind >= 0:
+        return kind, i, i + 1, i + 1
+    if c == _COLON and i + 1 < n and buf[i + 1] == _EQUALS:
+        return K_ASSIGN, i, i + 2, i + 2
+    if _is_id_start(c):
+        end = _scan_while_id(buf, i + 1)
+        return K_ID, i, end, end
+
+    end = _string_end(buf, i)
+    if end >= 0:
+        return K_STRING, i + 2, end, end + 1
+
+    kind, length = _keyword_at(buf, i)
+    return kind, i, i + length, i + length
+
+
+@njit(cache=True)
+def tokenize(buf: Any) -> tuple[Any, Any, Any, int]:
+    """
+    Тот же автомат, что и в `Parser._tokenize_dfa`, но над ASCII-байтами.
+
+    :param buf: Входной текст в виде массива uint8.
+    :return: Типы токенов, начала и концы их значений в `buf`
+        и позицию недопустимого символа (-1, если ошибок нет).
+    """
+    n = buf.shape[0]
+    kinds = np.empty(n, dtype=np.int8)
+    starts = np.empty(n, dtype=np.int32)
+    ends = np.empty(n, dtype=np.int32)
+    count = 0
+    i = 0
+    while i < n:
+        if _is_space(buf[i]):
+            i += 1
+            continue
+        kind, start, end, next_i = _next_token(buf, i)
+        if kind < 0:
+            return kinds[:count], starts[:count], ends[:count], i
+        kinds[count] = kind
+        starts[count] = start
+        ends[count] = end
+        count += 1
+        i = next_i
+    return kinds[:count], starts[:count], ends[:count], -1
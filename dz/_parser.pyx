@@ -0,0 +1,312 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Ускоренный на Cython синтаксический разбор для `main.Parser`.
+
+Токенизация и разрешение констант остаются в `main.Parser`: сюда передаются
+готовые массивы токенов, а разбор выполняется методами `cdef`, которые
+вызываются напрямую из C без накладных расходов на вызов методов Python.
+
+Сборка (из каталога dz): cythonize -i _parser.pyx
+"""
+
+# Должны совпадать с K_* в main.py, main сверяет KIND_NAMES перед использованием
+cdef enum:
+    K_NUMBER = 0
+    K_STRING = 1
+    K_ID = 2
+    K_ASSIGN = 3
+    K_SEMICOLON = 4
+    K_BEGIN = 5
+    K_END = 6
+    K_IS = 7
+    K_PIPE = 8
+    K_PLUS = 9
+    K_MINUS = 10
+    K_TIMES = 11
+    K_LPAREN = 12
+    K_RPAREN = 13
+    K_ORD = 14
+    K_CONST_REF = 15
+    K_EOF = -1
+
+KIND_NAMES = (
+    "NUMBER",
+    "STRING",
+    "ID",
+    "ASSIGN",
+    "SEMICOLON",
+    "BEGIN",
+    "END",
+    "IS",
+    "PIPE",
+    "PLUS",
+    "MINUS",
+    "TIMES",
+    "LPAREN",
+    "RPAREN",
+    "ORD",
+    "ID",
+)
+
+
+cdef class CParser:
+    cdef const signed char[::1] kinds
+    cdef list values
+    cdef list const_names
+    cdef list const_values
+    cdef object undefined
+    cdef dict repeated_expressions
+    cdef dict expression_cache
+    cdef Py_ssize_t pos
+    cdef Py_ssize_t n
+
+    def __init__(
+        self,
+        object kinds,
+        list values,
+        list const_names,
+        list const_values,
+        dict repeated_expressions,
+        object undefined,
+    ):
+        """
+        :param kinds: Типы токенов (K_*), array.array('b').
+        :param values: Значения токенов.
+        :param const_names: Имена констант по слотам.
+        :param const_values: Значения констант по слотам, заполняются при разборе.
+        :param repeated_expressions: Повторяющиеся выражения, см.
+            `main.Parser._find_repeated_expressions`.
+        :param undefined: Значение слота ещё не объявленной константы.
+        """
+        self.kinds = kinds
+        self.values = values
+        self.const_names = const_names
+        self.const_values = const_values
+        self.repeated_expressions = repeated_expressions
+        self.undefined = undefined
+        self.expression_cache = {}
+        self.pos = 0
+        self.n = len(kinds)
+
+    cdef inline int kind_at(self, Py_ssize_t pos):
+        """Тип токена в позиции `pos` или K_EOF за концом ввода."""
+        if pos < self.n:
+            return self.kinds[pos]
+        return K_EOF
+
+    cdef object expect(self, int expected_kind):
+        """Потребляет токен ожидаемого типа и возвращает его значение."""
+        cdef int kind = self.kind_at(self.pos)
+        if kind == expected_kind:
+            self.pos += 1
+            return self.values[self.pos - 1]
+        raise SyntaxError(
+            f"Expected {KIND_NAMES[expected_kind]} but got "
+            f"{'EOF' if kind == K_EOF else KIND_NAMES[kind]}",
+        )
+
+    cdef str describe_token(self):
+        """Описание текущего токена для сообщений об ошибках."""
+        cdef int kind = self.kind_at(self.pos)
+        if kind == K_EOF:
+            return "None"
+        value = self.values[self.pos]
+        if kind == K_STRING:
+            value = f"q({value})"
+        elif kind == K_NUMBER:
+            value = str(value)
+        elif kind == K_CONST_REF:
+            value = self.const_names[value]
+        return str((KIND_NAMES[kind], value))
+
+    cdef object constant_value(self, Py_ssize_t pos, str error):
+        """Значение константы, на которую ссылается токен `pos`."""
+        if self.kinds[pos] == K_CONST_REF:
+            slot = self.values[pos]
+            value = self.const_values[slot]
+            if value is not self.undefined:
+                return value
+            name = self.const_names[slot]
+        else:
+            name = self.values[pos]
+        raise SyntaxError(f"{error}: {name}")
+
+    def parse(self):
+        """Парсит объявления констант и один основной словарь."""
+        while (
+            self.pos + 1 < self.n
+            and self.kind_at(self.pos) == K_CONST_REF
+            and self.kind_at(self.pos + 1) == K_IS
+        ):
+            self.parse_constant_declaration()
+
+        if self.kind_at(self.pos) == K_BEGIN:
+            return self.parse_dictionary()
+
+        if self.pos < self.n:
+            raise SyntaxError(
+                f"Unexpected token at end of input: {self.describe_token()}",
+            )
+        return {}
+
+    cdef int parse_constant_declaration(self) except -1:
+        slot = self.expect(K_CONST_REF)
+        self.expect(K_IS)
+        value = self.parse_value()
+        if self.const_values[slot] is not self.undefined:
+            self.expression_cache.clear()
+        self.const_values[slot] = value
+        return 0
+
+    cdef object parse_key(self):
+        cdef Py_ssize_t pos = self.pos
+        if self.kind_at(pos) == K_CONST_REF:
+            self.pos = pos + 1
+            return self.const_names[self.values[pos]]
+        return self.expect(K_ID)
+
+    cdef object parse_value(self):
+        cdef Py_ssize_t pos = self.pos
+        cdef int kind = self.kind_at(pos)
+        if kind == K_EOF:
+            raise SyntaxError("Unexpected EOF while parsing value")
+
+        if kind == K_NUMBER or kind == K_STRING:
+            self.pos = pos + 1
+            return self.values[pos]
+        if kind == K_CONST_REF:
+            value = self.const_values[self.values[pos]]
+            if value is not self.undefined:
+                self.pos = pos + 1
+                return value
+        if kind == K_ID or kind == K_CONST_REF:
+            return self.constant_value(pos, "Undefined constant")
+        if kind == K_BEGIN:
+            return self.parse_dictionary()
+        if kind == K_PIPE:
+            return self.parse_expression()
+        raise SyntaxError(
+            f"Unexpected token when parsing value: {self.describe_token()}",
+        )
+
+    cdef dict parse_dictionary(self):
+        cdef dict result = {}
+        cdef list stack = []
+        cdef dict parent
+        self.expect(K_BEGIN)
+        while True:
+            if self.pos < self.n and self.kind_at(self.pos) != K_END:
+                name = self.parse_key()
+                self.expect(K_ASSIGN)
+                if self.kind_at(self.pos) == K_BEGIN:
+                    self.pos += 1
+                    stack.append((result, name))
+                    result = {}
+                    continue
+                result[name] = self.parse_value()
+                self.expect(K_SEMICOLON)
+                continue
+
+            self.expect(K_END)
+            if not stack:
+                return result
+            parent, name = stack.pop()
+            parent[name] = result
+            result = parent
+            self.expect(K_SEMICOLON)
+
+    cdef object parse_expression(self):
+        cdef Py_ssize_t end
+        repeated = self.repeated_expressions.get(self.pos)
+        if repeated is not None:
+            end = repeated[0]
+            cached = self.expression_cache.get(repeated[1], self.undefined)
+            if cached is not self.undefined:
+                self.pos = end + 1
+                return cached
+
+        self.expect(K_PIPE)
+        value = self.parse_additive_expression()
+        self.expect(K_PIPE)
+        if repeated is not None:
+            self.expression_cache[repeated[1]] = value
+        return value
+
+    cdef object parse_additive_expression(self):
+        cdef int kind
+        value = self.parse_multiplicative_expression()
+        while True:
+            kind = self.kind_at(self.pos)
+            if kind != K_PLUS and kind != K_MINUS:
+                return value
+            self.pos += 1
+            term = self.parse_multiplicative_expression()
+
+            is_str = type(value) is str and type(term) is str
+            is_int = type(value) is int and type(term) is int
+
+            if kind == K_PLUS and (is_str or is_int):
+                value += term
+            elif kind == K_MINUS and is_int:
+                value -= term
+            else:
+                op = "+" if kind == K_PLUS else "-"
+                raise TypeError(f"Unsupported operand types for {op}")
+
+    cdef object parse_multiplicative_expression(self):
+        value = self.parse_factor()
+        while self.kind_at(self.pos) == K_TIMES:
+            self.pos += 1
+            factor = self.parse_factor()
+
+            if type(factor) is int and (type(value) is int or type(value) is str):
+                value *= factor
+            elif type(value) is int and type(factor) is str:
+                value = factor * value
+            else:
+                raise TypeError("Unsupported operand types for *")
+        return value
+
+    cdef object parse_factor(self):
+        cdef Py_ssize_t pos = self.pos
+        cdef int kind = self.kind_at(pos)
+        if kind == K_LPAREN:
+            self.pos = pos + 1
+            value = self.parse_additive_expression()
+            self.expect(K_RPAREN)
+            return value
+        if kind == K_NUMBER or kind == K_STRING:
+            self.pos = pos + 1
+            return self.values[pos]
+        if kind == K_ID or kind == K_CONST_REF:
+            self.pos = pos + 1
+            return self.constant_value(pos, "Undefined constant in expression")
+        if kind == K_ORD:
+            return self.parse_ord()
+        raise SyntaxError(
+            f"Unexpected token in expression factor: {self.describe_token()}",
+        )
+
+    cdef object parse_ord(self):
+        cdef Py_ssize_t pos
+        cdef int kind
+        self.expect(K_ORD)
+        self.expect(K_LPAREN)
+
+        pos = self.pos
+        kind = self.kind_at(pos)
+        if kind == K_STRING:
+            value = self.values[pos]
+        elif kind == K_ID or kind == K_CONST_REF:
+            value = self.constant_value(pos, "Undefined constant")
+        else:
+            raise SyntaxError(
+                "ord() argument must be a string literal or a constant.",
+            )
+
+        if type(value) is not str or len(value) != 1:
+            raise SyntaxError("ord() expects a single character string")
+
+        self.pos = pos + 1
+        self.expect(K_RPAREN)
+        return ord(value)
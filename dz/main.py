@@ -1,72 +1,449 @@
-import argparse
-import json
+from __future__ import annotations
+
+import array
+import functools
 import re
+import string
 import sys
-from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, NoReturn
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from pathlib import Path
+    from typing import TextIO
+
+# Порядок важен: сначала самые частые и дешёвые альтернативы.
+# Числа идут раньше PLUS/MINUS, чтобы знак оставался частью числа.
+_TOKEN_SPEC = (
+    ("SKIP", r"\s+"),  # Пропуск пробелов
+    ("SEMICOLON", r";"),  # Точка с запятой
+    ("PIPE", r"\|"),  # Разделитель выражений
+    ("TIMES", r"\*"),
+    ("LPAREN", r"\("),
+    ("RPAREN", r"\)"),
+    ("ASSIGN", r":="),  # Оператор присваивания
+    ("NUMBER", r"[+-]?\d+"),  # Числа
+    ("PLUS", r"\+"),
+    ("MINUS", r"-"),
+    ("STRING", r"q\((?P<STRING_INNER>.*?)\)"),  # Строки
+    ("KEYWORD", r"begin|end|is|ord"),  # Ключевые слова
+    ("ID", r"[A-Z_][A-Z_0-9]*"),  # Имена констант
+    ("MISMATCH", r"."),  # Любой другой символ
+)
+# Типы токенов в виде небольших целых чисел: сравнение int дешевле сравнения строк
+(
+    K_NUMBER,
+    K_STRING,
+    K_ID,
+    K_ASSIGN,
+    K_SEMICOLON,
+    K_BEGIN,
+    K_END,
+    K_IS,
+    K_PIPE,
+    K_PLUS,
+    K_MINUS,
+    K_TIMES,
+    K_LPAREN,
+    K_RPAREN,
+    K_ORD,
+    K_CONST_REF,  # Ссылка на объявленную константу, значение токена - номер слота
+) = range(16)
+# Имена типов токенов для сообщений об ошибках, индекс совпадает с K_*
+_KIND_NAMES = (
+    "NUMBER",
+    "STRING",
+    "ID",
+    "ASSIGN",
+    "SEMICOLON",
+    "BEGIN",
+    "END",
+    "IS",
+    "PIPE",
+    "PLUS",
+    "MINUS",
+    "TIMES",
+    "LPAREN",
+    "RPAREN",
+    "ORD",
+    "ID",  # K_CONST_REF в сообщениях об ошибках выглядит как обычное имя
+)
+_KIND_BY_GROUP = {
+    name: kind for kind, name in enumerate(_KIND_NAMES) if kind != K_CONST_REF
+}
+# Токены, после которых имя стоит в позиции значения, а не ключа
+_VALUE_PREFIX_KINDS = frozenset(
+    (K_ASSIGN, K_IS, K_PIPE, K_PLUS, K_MINUS, K_TIMES, K_LPAREN),
+)
+# Токены, значение которых берётся прямо из токена
+_LITERAL_KINDS = frozenset((K_NUMBER, K_STRING))
+# Токены, которые ссылаются на константу по имени или по слоту
+_NAME_KINDS = frozenset((K_ID, K_CONST_REF))
+# Ключ кеша выражения: байты типов его токенов и кортеж их значений
+_ExpressionKey = tuple[bytes, tuple[Any, ...]]
+# Значение ещё не объявленной константы
+_UNDEFINED = object()
+# Ключевые слова объединены в одну группу и различаются уже после совпадения
+_KEYWORDS = {
+    "begin": K_BEGIN,  # Начало блока словаря
+    "end": K_END,  # Конец блока словаря
+    "is": K_IS,  # Оператор объявления константы
+    "ord": K_ORD,
+}
+_KEYWORD_BY_FIRST_CHAR = {keyword[0]: keyword for keyword in _KEYWORDS}
+# Односимвольные токены для ручного токенизатора
+_PUNCTUATION = {
+    ";": K_SEMICOLON,
+    "|": K_PIPE,
+    "*": K_TIMES,
+    "(": K_LPAREN,
+    ")": K_RPAREN,
+}
+_ID_START = frozenset(string.ascii_uppercase + "_")
+_ID_CHARS = frozenset(string.ascii_uppercase + "_" + string.digits)
+# Общее регулярное выражение собирается один раз при импорте модуля
+_TOKEN_RE = re.compile(
+    "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _TOKEN_SPEC),
+)
+# Начиная с этого размера входа выгоднее токенизировать через numba.
+# Импорт numba и загрузка ядра из кеша занимают ~0.4 с, а `_tokenize_dfa`
+# обрабатывает ~17 МБ/с: по замерам numba окупается на входах от ~15 МБ.
+_NUMBA_MIN_SIZE = 16 << 20
+# Размер блока, которым поток читается в `_tokenize_stream`
+_STREAM_CHUNK_SIZE = 1 << 16
+
+
+@functools.cache
+def _load_numba_tokenizer() -> Callable[[Any], tuple[Any, Any, Any, int]] | None:
+    """
+    Загружает токенизатор numba из `_numba_tokenizer` при первом обращении.
+    numba необязателен и импортируется лениво, чтобы не замедлять запуск CLI.
+
+    :return: Функция токенизации или None, если numba не установлен.
+    """
+    try:
+        # Импорт numba занимает сотни миллисекунд, поэтому он отложен
+        import _numba_tokenizer  # noqa: PLC0415
+    except ImportError:
+        return None
+
+    # Ядро не создаёт K_CONST_REF, поэтому сверяются только остальные типы
+    kind_names = _numba_tokenizer.KIND_NAMES
+    if _KIND_NAMES[: len(kind_names)] != kind_names:
+        return None
+    tokenize: Callable[[Any], tuple[Any, Any, Any, int]] = _numba_tokenizer.tokenize
+    return tokenize
+
+
+@functools.cache
+def _load_cparser() -> Any | None:
+    """
+    Загружает ускоренный на Cython разбор из `_parser.pyx`, если он собран
+    (`cythonize -i _parser.pyx`) и его типы токенов совпадают с K_*.
+
+    :return: Класс `CParser` или None.
+    """
+    try:
+        # Модуль может быть не собран, поэтому импорт необязательный и ленивый
+        import _parser  # noqa: PLC0415
+    except ImportError:
+        return None
+
+    if _parser.KIND_NAMES != _KIND_NAMES:
+        return None
+    return _parser.CParser
 
 
 class Parser:
-    def __init__(self, text: str) -> None:
-        self._tokens = self._tokenize(text)
+    def __init__(
+        self,
+        text: str | Iterable[tuple[list[int], list[Any]]],
+        *,
+        use_regex: bool = False,
+        use_cython: bool = True,
+    ) -> None:
+        """
+        :param text: Входной текст или уже разобранные на токены части текста,
+            например из `_tokenize_stream`. Для токенов флаги токенизаторов
+            не используются.
+        :param use_regex: Использовать токенизатор на регулярных выражениях
+            вместо ручного (для сверки результатов).
+        :param use_cython: Разбирать токены модулем `_parser`, если он собран.
+        """
+        kinds: Iterable[int]
+        if not isinstance(text, str):
+            kinds = array.array("b")
+            values: list[Any] = []
+            for part_kinds, part_values in text:
+                kinds.extend(part_kinds)
+                values += part_values
+        elif use_regex:
+            kinds, values = self._tokenize(text)
+        elif (
+            len(text) >= _NUMBA_MIN_SIZE
+            and text.isascii()
+            and _load_numba_tokenizer() is not None
+        ):
+            kinds, values = self._tokenize_numba(text)
+        else:
+            kinds, values = self._tokenize_dfa(text)
+        # Типы токенов хранятся по байту на токен, а не ссылками на объекты int
+        self._kinds = (
+            kinds if isinstance(kinds, array.array) else array.array("b", kinds)
+        )
+        self._values = values
         self._pos = 0
-        self._constants: dict[str, Any] = {}
-
-    def _tokenize(self, text: str) -> list[tuple[str, str]]:
+        self._use_cython = use_cython
+        # Константы хранятся по слотам, ссылки на них заменяются номерами слотов
+        self._const_names: list[str] = []
+        self._const_values: list[Any] = []
+        self._resolve_constants()
+        # Выражения, которые встречаются во входе больше одного раза:
+        # позиция открывающей '|' -> (позиция закрывающей '|', ключ кеша)
+        self._repeated_expressions: dict[int, tuple[int, _ExpressionKey]] = {}
+        self._find_repeated_expressions()
+        # Результаты уже вычисленных повторяющихся выражений по их ключам
+        self._expression_cache: dict[_ExpressionKey, Any] = {}
+        # Таблицы разбора: тип первого токена -> обработчик.
+        # Числа, строки и константы `_parse_value` разбирает сам.
+        self._value_dispatch: dict[int, Callable[[], Any]] = {
+            K_BEGIN: self._parse_dictionary,
+            K_PIPE: self._parse_expression,
+        }
+        self._factor_dispatch: dict[int, Callable[[], Any]] = {
+            K_LPAREN: self._parse_parenthesized,
+            K_STRING: self._parse_literal,
+            K_NUMBER: self._parse_literal,
+            K_ID: self._parse_factor_constant,
+            K_CONST_REF: self._parse_factor_constant,
+            K_ORD: self._parse_ord,
+        }
+
+    @staticmethod
+    def _tokenize(text: str) -> tuple[list[int], list[Any]]:
         """
-        Разбивает входной текст на список токенов.
+        Разбивает входной текст на токены.
 
         :param text: Входной текст.
-        :return: Список токенов в формате (ТИП, ЗНАЧЕНИЕ).
+        :return: Два параллельных списка: типы токенов (K_*) и их значения
+            (числа уже приведены к int).
         """
-        token_specification = [
-            ("NUMBER", r"[+-]?\d+"),  # Числа
-            ("STRING", r"q\((.*?)\)"),  # Строки
-            ("ID", r"[A-Z_][A-Z_0-9]*"),  # Имена констант
-            ("ASSIGN", r":="),  # Оператор присваивания
-            ("SEMICOLON", r";"),  # Точка с запятой
-            ("BEGIN", r"begin"),  # Начало блока словаря
-            ("END", r"end"),  # Конец блока словаря
-            ("IS", r"is"),  # Оператор объявления константы
-            ("PIPE", r"\|"),  # Разделитель выражений
-            ("PLUS", r"\+"),
-            ("MINUS", r"-"),
-            ("TIMES", r"\*"),
-            ("LPAREN", r"\("),
-            ("RPAREN", r"\)"),
-            ("ORD", r"ord"),
-            ("SKIP", r"[\s\n\t]+"),  # Пропуск пробелов
-            ("MISMATCH", r"."),  # Любой другой символ
-        ]
-        tok_regex = "|".join(
-            f"(?P<{pair[0]}>{pair[1]})" for pair in token_specification
-        )
-        tokens = []
-        for mo in re.finditer(tok_regex, text):
-            kind = mo.lastgroup
-            value = mo.group()
-            if kind == "SKIP":
+        kinds: list[int] = []
+        values: list[Any] = []
+        for mo in _TOKEN_RE.finditer(text):
+            group = mo.lastgroup
+            value: Any = mo.group()
+            if group == "SKIP":
                 continue
-            if kind == "MISMATCH" or kind is None:
+            if group == "STRING":
+                # Сохраняем только содержимое между 'q(' и ')'
+                kinds.append(K_STRING)
+                value = mo.group("STRING_INNER")
+            elif group == "NUMBER":
+                # Числа переводятся в int один раз, при разборе на токены
+                kinds.append(K_NUMBER)
+                value = int(value)
+            elif group == "ID":
+                # Имена интернируются: поиск в словаре констант сравнивает указатели
+                kinds.append(K_ID)
+                value = sys.intern(value)
+            elif group == "KEYWORD":
+                kinds.append(_KEYWORDS[value])
+            elif group == "MISMATCH" or group is None:
                 raise SyntaxError(f"Unexpected character: {value}")
-            tokens.append((kind, value))
-        return tokens
+            else:
+                kinds.append(_KIND_BY_GROUP[group])
+            values.append(value)
+        return kinds, values
+
+    # Все состояния автомата разбираются в одном цикле: вынос ветвей
+    # в отдельные функции добавил бы вызов функции на каждый токен
+    @staticmethod
+    def _tokenize_dfa(text: str) -> tuple[list[int], list[Any]]:  # noqa: C901
+        """
+        Разбивает входной текст на токены за один проход по символам.
+        Повторяет поведение `_tokenize`, но обходится без регулярных выражений.
+
+        :param text: Входной текст.
+        :return: Два параллельных списка: типы токенов (K_*) и их значения.
+        """
+        kinds: list[int] = []
+        values: list[Any] = []
+        n = len(text)
+        i = 0
+        while i < n:
+            ch = text[i]
+            if ch.isspace():
+                i += 1
+                continue
+
+            # Каждая ветвь задаёт тип и значение токена и сдвигает i за его конец
+            start = i
+            value: Any = ch
+            kind = _PUNCTUATION.get(ch)
+            if kind is not None:
+                i += 1
+            elif ch.isdecimal() or (
+                ch in "+-" and i + 1 < n and text[i + 1].isdecimal()
+            ):
+                i += 1
+                while i < n and text[i].isdecimal():
+                    i += 1
+                kind = K_NUMBER
+                value = int(text[start:i])
+            elif ch in "+-":
+                i += 1
+                kind = K_PLUS if ch == "+" else K_MINUS
+            elif ch == ":" and text.startswith("=", i + 1):
+                i += 2
+                kind = K_ASSIGN
+                value = ":="
+            elif ch in _ID_START:
+                i += 1
+                while i < n and text[i] in _ID_CHARS:
+                    i += 1
+                kind = K_ID
+                value = sys.intern(text[start:i])
+            elif (
+                ch == "q"
+                and text.startswith("(", i + 1)
+                and (end := text.find(")", i + 2)) != -1
+                and text.find("\n", i + 2, end) == -1
+            ):
+                # Строка заканчивается первой ')' в пределах той же строки
+                kind = K_STRING
+                value = text[i + 2 : end]
+                i = end + 1
+            else:
+                keyword = _KEYWORD_BY_FIRST_CHAR.get(ch)
+                if keyword is None or not text.startswith(keyword, i):
+                    raise SyntaxError(f"Unexpected character: {ch}")
+                i += len(keyword)
+                kind = _KEYWORDS[keyword]
+                value = keyword
+
+            kinds.append(kind)
+            values.append(value)
+        return kinds, values
+
+    @staticmethod
+    def _tokenize_numba(text: str) -> tuple[list[int], list[Any]]:
+        """
+        Разбивает входной текст на токены с помощью скомпилированного numba автомата.
+        Работает только для ASCII-текста, где смещения байтов совпадают
+        со смещениями символов.
+
+        :param text: Входной текст.
+        :return: Два параллельных списка: типы токенов (K_*) и их значения.
+        """
+        # numpy нужен только вместе с numba, поэтому импортируется здесь
+        import numpy as np  # noqa: PLC0415
+
+        tokenize_nb = _load_numba_tokenizer()
+        if tokenize_nb is None:
+            raise RuntimeError("numba is not installed")
+        buf = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        kinds, starts, ends, error_pos = tokenize_nb(buf)
+        if error_pos >= 0:
+            raise SyntaxError(f"Unexpected character: {text[error_pos]}")
+        kinds = kinds.tolist()
+        values: list[Any] = [
+            text[start:end]
+            for start, end in zip(starts.tolist(), ends.tolist(), strict=True)
+        ]
+        for i, kind in enumerate(kinds):
+            if kind == K_ID:
+                values[i] = sys.intern(values[i])
+            elif kind == K_NUMBER:
+                values[i] = int(values[i])
+        return kinds, values
+
+    def _resolve_constants(self) -> None:
+        """
+        Назначает каждой объявленной константе слот и заменяет ссылки на неё
+        (и имена в самих объявлениях) токенами K_CONST_REF с номером слота,
+        чтобы при разборе значение доставалось индексом списка,
+        а не поиском в словаре.
+        """
+        kinds = self._kinds
+        values = self._values
+        slots: dict[str, int] = {}
+        n = len(kinds)
+        for i in range(n - 1):
+            if kinds[i] == K_ID and kinds[i + 1] == K_IS and values[i] not in slots:
+                slots[values[i]] = len(self._const_names)
+                self._const_names.append(values[i])
+                self._const_values.append(_UNDEFINED)
+        if not slots:
+            return
+
+        for i in range(n):
+            if (
+                kinds[i] == K_ID
+                and (
+                    (i > 0 and kinds[i - 1] in _VALUE_PREFIX_KINDS)
+                    or (i + 1 < n and kinds[i + 1] == K_IS)
+                )
+                and (slot := slots.get(values[i])) is not None
+            ):
+                kinds[i] = K_CONST_REF
+                values[i] = slot
+
+    def _find_repeated_expressions(self) -> None:
+        """
+        Находит выражения `|...|` с одинаковыми токенами, чтобы при разборе
+        кешировать только их: для остальных выражений кеш ничего не стоит.
+        Внутри выражения не может быть '|', поэтому оно заканчивается
+        на ближайшем следующем '|', а поиск идёт по байтам типов токенов.
+        """
+        kinds = self._kinds.tobytes()
+        values = self._values
+        pipe = bytes((K_PIPE,))
+        first: dict[_ExpressionKey, tuple[int, int]] = {}
+        start = kinds.find(pipe)
+        while start != -1:
+            end = kinds.find(pipe, start + 1)
+            if end == -1:
+                break
+            key = (kinds[start + 1 : end], tuple(values[start + 1 : end]))
+            first_span = first.setdefault(key, (start, end))
+            if first_span[0] != start:
+                self._repeated_expressions[first_span[0]] = (first_span[1], key)
+                self._repeated_expressions[start] = (end, key)
+            start = kinds.find(pipe, end + 1)
+
+    def _constant_value(self, pos: int, error: str) -> Any:
+        """
+        Возвращает значение константы, на которую ссылается токен `pos`.
+
+        :param pos: Позиция токена K_ID или K_CONST_REF.
+        :param error: Начало сообщения об ошибке для неопределенной константы.
+        """
+        if self._kinds[pos] == K_CONST_REF:
+            slot = self._values[pos]
+            value = self._const_values[slot]
+            if value is not _UNDEFINED:
+                return value
+            name = self._const_names[slot]
+        else:
+            name = self._values[pos]
+        raise SyntaxError(f"{error}: {name}")
 
-    def _peek(self) -> tuple[str, str] | None:
+    def _peek(self) -> tuple[int, Any] | None:
         """Возвращает следующий токен, не сдвигая позицию."""
-        if self._pos < len(self._tokens):
-            return self._tokens[self._pos]
+        if self._pos < len(self._kinds):
+            return self._kinds[self._pos], self._values[self._pos]
         return None
 
-    def _consume(self, expected_kind: str) -> tuple[str, str] | None:
+    def _consume(self, expected_kind: int) -> tuple[int, Any] | None:
         """Потребляет следующий токен, если он соответствует ожидаемому типу."""
-        token = self._peek()
-        if token and token[0] == expected_kind:
-            self._pos += 1
-            return token
+        pos = self._pos
+        if pos < len(self._kinds) and self._kinds[pos] == expected_kind:
+            self._pos = pos + 1
+            return expected_kind, self._values[pos]
         return None
 
-    def _expect(self, expected_kind: str) -> tuple[str, str]:
+    def _expect(self, expected_kind: int) -> tuple[int, Any]:
         """
         Ожидает и потребляет токен определенного типа.
         Вызывает ошибку, если тип не совпадает.
@@ -76,123 +453,203 @@ class Parser:
             return token
         current_token = self._peek()
         raise SyntaxError(
-            f"Expected {expected_kind} but got "
-            f"{current_token[0] if current_token else 'EOF'}",
+            f"Expected {_KIND_NAMES[expected_kind]} but got "
+            f"{_KIND_NAMES[current_token[0]] if current_token else 'EOF'}",
         )
 
+    def _describe_token(self) -> str:
+        """Описание текущего токена для сообщений об ошибках."""
+        token = self._peek()
+        if token is None:
+            return "None"
+        kind, value = token
+        if kind == K_STRING:
+            value = f"q({value})"
+        elif kind == K_NUMBER:
+            value = str(value)
+        elif kind == K_CONST_REF:
+            value = self._const_names[value]
+        return str((_KIND_NAMES[kind], value))
+
     def parse(self) -> dict[str, Any]:
         """
         Основной метод парсинга.
         Парсит объявления констант и один основной словарь.
         """
+        cparser = _load_cparser() if self._use_cython else None
+        if cparser is not None:
+            result: dict[str, Any] = cparser(
+                self._kinds,
+                self._values,
+                self._const_names,
+                self._const_values,
+                self._repeated_expressions,
+                _UNDEFINED,
+            ).parse()
+            return result
+
+        kinds = self._kinds
+        n = len(kinds)
         # На верхнем уровне могут быть объявления констант или один словарь
         while (
-            self._peek()
-            and self._peek()[0] == "ID"
-            and self._pos + 1 < len(self._tokens)
-            and self._tokens[self._pos + 1][0] == "IS"
+            self._pos + 1 < n
+            and kinds[self._pos] == K_CONST_REF
+            and kinds[self._pos + 1] == K_IS
         ):
             self._parse_constant_declaration()
 
-        if self._peek() and self._peek()[0] == "BEGIN":
+        if self._pos < n and kinds[self._pos] == K_BEGIN:
             return self._parse_dictionary()
 
         # Если словаря нет, возвращаем пустой объект
-        # Это может произойти, если ввод содержит только объявления констант
-        peek = self._peek()
-        if self._pos == len(self._tokens) or (peek is not None and peek[0] != "BEGIN"):
-            # Проверяем наличие необработанных токенов для большей строгости
-            if self._pos < len(self._tokens):
-                raise SyntaxError(
-                    f"Unexpected token at end of input: {self._peek()}",
-                )
-            return {}
-
-        raise SyntaxError(
-            "Expected 'begin' to start a dictionary or constant declarations.",
-        )
+        # Это может произойти, если ввод содержит только объявления констант.
+        # Проверяем наличие необработанных токенов для большей строгости
+        if self._pos < n:
+            raise SyntaxError(
+                f"Unexpected token at end of input: {self._describe_token()}",
+            )
+        return {}
 
     def _parse_constant_declaration(self) -> None:
         """Парсит объявление константы."""
-        name_token = self._expect("ID")
-        self._expect("IS")
+        slot = self._expect(K_CONST_REF)[1]
+        self._expect(K_IS)
         value = self._parse_value()
-        self._constants[name_token[1]] = value
+        if self._const_values[slot] is not _UNDEFINED:
+            # Константа переопределена: закешированные выражения могли её использовать
+            self._expression_cache.clear()
+        self._const_values[slot] = value
+
+    def _parse_key(self) -> str:
+        """Парсит имя ключа словаря (оно может совпадать с именем константы)."""
+        pos = self._pos
+        if pos < len(self._kinds) and self._kinds[pos] == K_CONST_REF:
+            self._pos = pos + 1
+            name: str = self._const_names[self._values[pos]]
+        else:
+            name = self._expect(K_ID)[1]
+        return name
 
     def _parse_value(self) -> Any:
         """Парсинг значения (число, строка, словарь, константа или выражение)."""
-        token = self._peek()
-        if not token:
+        pos = self._pos
+        kinds = self._kinds
+        if pos >= len(kinds):
             raise SyntaxError("Unexpected EOF while parsing value")
 
-        token_kind = token[0]
-
-        if token_kind == "NUMBER":
-            self._pos += 1
-            return int(token[1])
-        if token_kind == "STRING":
-            self._pos += 1
-            return token[1][2:-1]  # Удаляем 'q(' и ')'
-        if token_kind == "BEGIN":
-            return self._parse_dictionary()
-        if token_kind == "ID":
-            if token[1] in self._constants:
-                self._pos += 1
-                return self._constants[token[1]]
-            raise SyntaxError(f"Undefined constant: {token[1]}")
-        if token_kind == "PIPE":
-            return self._parse_expression()
+        # Самые частые значения разбираются на месте, без вызова обработчика
+        kind = kinds[pos]
+        if kind in _LITERAL_KINDS:
+            self._pos = pos + 1
+            return self._values[pos]
+        if kind == K_CONST_REF:
+            value = self._const_values[self._values[pos]]
+            if value is not _UNDEFINED:
+                self._pos = pos + 1
+                return value
+        if kind in _NAME_KINDS:
+            return self._constant_value(pos, "Undefined constant")
+
+        handler = self._value_dispatch.get(kind)
+        if handler is None:
+            raise SyntaxError(
+                f"Unexpected token when parsing value: {self._describe_token()}",
+            )
+        return handler()
 
-        raise SyntaxError(f"Unexpected token when parsing value: {token}")
+    def _parse_literal(self) -> Any:
+        """Парсит числовой или строковый литерал."""
+        value = self._values[self._pos]
+        self._pos += 1
+        return value
 
     def _parse_dictionary(self) -> dict[str, Any]:
-        """Парсит блок словаря."""
-        self._expect("BEGIN")
-        result = {}
-        while self._peek() and self._peek()[0] != "END":
-            name_token = self._expect("ID")
-            self._expect("ASSIGN")
-            value = self._parse_value()
-            result[name_token[1]] = value
-            self._expect("SEMICOLON")
-        self._expect("END")
-        return result
+        """
+        Парсит блок словаря.
+        Вложенные словари разбираются без рекурсии: родительский словарь
+        и ключ, под которым будет записан вложенный, хранятся в стеке.
+        """
+        kinds = self._kinds
+        n = len(kinds)
+        self._expect(K_BEGIN)
+        result: dict[str, Any] = {}
+        stack: list[tuple[dict[str, Any], str]] = []
+        while True:
+            if self._pos < n and kinds[self._pos] != K_END:
+                name = self._parse_key()
+                self._expect(K_ASSIGN)
+                if self._pos < n and kinds[self._pos] == K_BEGIN:
+                    # Вложенный словарь: откладываем текущий и начинаем новый
+                    self._pos += 1
+                    stack.append((result, name))
+                    result = {}
+                    continue
+                result[name] = self._parse_value()
+                self._expect(K_SEMICOLON)
+                continue
+
+            self._expect(K_END)
+            if not stack:
+                return result
+            parent, name = stack.pop()
+            parent[name] = result
+            result = parent
+            self._expect(K_SEMICOLON)
 
     def _parse_expression(self) -> Any:
-        """Парсит константное выражение, заключенное в '|'."""
-        self._expect("PIPE")
+        """
+        Парсит константное выражение, заключенное в '|'.
+        Повторяющиеся выражения (см. `_find_repeated_expressions`)
+        вычисляются один раз.
+        """
+        repeated = self._repeated_expressions.get(self._pos)
+        if repeated is not None:
+            end, key = repeated
+            cached = self._expression_cache.get(key, _UNDEFINED)
+            if cached is not _UNDEFINED:
+                self._pos = end + 1
+                return cached
+
+        self._expect(K_PIPE)
         value = self._parse_additive_expression()
-        self._expect("PIPE")
+        self._expect(K_PIPE)
+        if repeated is not None:
+            self._expression_cache[repeated[1]] = value
         return value
 
     def _parse_additive_expression(self) -> Any:
         """Парсит выражения со сложением и вычитанием."""
+        kinds = self._kinds
+        n = len(kinds)
         value = self._parse_multiplicative_expression()
-        while self._peek() and self._peek()[0] in ("PLUS", "MINUS"):
-            op = self._consume(self._peek()[0])
+        while self._pos < n and (kind := kinds[self._pos]) in (K_PLUS, K_MINUS):
+            self._pos += 1
             term = self._parse_multiplicative_expression()
 
-            is_str = isinstance(value, str) and isinstance(term, str)
-            is_int = isinstance(value, int) and isinstance(term, int)
+            is_str = type(value) is str and type(term) is str
+            is_int = type(value) is int and type(term) is int
 
-            if op[0] == "PLUS" and (is_str or is_int):
+            if kind == K_PLUS and (is_str or is_int):
                 value += term
-            elif op[0] == "MINUS" and is_int:
+            elif kind == K_MINUS and is_int:
                 value -= term
             else:
-                raise TypeError(f"Unsupported operand types for {op[1]}")
+                op = "+" if kind == K_PLUS else "-"
+                raise TypeError(f"Unsupported operand types for {op}")
         return value
 
     def _parse_multiplicative_expression(self) -> Any:
         """Парсит выражения с умножением."""
+        kinds = self._kinds
+        n = len(kinds)
         value = self._parse_factor()
-        while self._peek() and self._peek()[0] == "TIMES":
-            self._consume("TIMES")
+        while self._pos < n and kinds[self._pos] == K_TIMES:
+            self._pos += 1
             factor = self._parse_factor()
 
-            is_int_int = isinstance(value, int) and isinstance(factor, int)
-            is_str_int = isinstance(value, str) and isinstance(factor, int)
-            is_int_str = isinstance(value, int) and isinstance(factor, str)
+            is_int_int = type(value) is int and type(factor) is int
+            is_str_int = type(value) is str and type(factor) is int
+            is_int_str = type(value) is int and type(factor) is str
 
             if is_int_int or is_str_int:
                 value *= factor
@@ -204,69 +661,163 @@ class Parser:
 
     def _parse_factor(self) -> Any:
         """Парсинг фактора выражения (число, строка, константа, ord(), подвыражение)."""
-        if self._consume("LPAREN"):
-            value = self._parse_additive_expression()
-            self._expect("RPAREN")
-            return value
-        if self._peek()[0] == "STRING":
-            return self._consume("STRING")[1][2:-1]
-        if self._peek()[0] == "NUMBER":
-            return int(self._consume("NUMBER")[1])
-        if self._peek()[0] == "ID":
-            name = self._consume("ID")[1]
-            if name in self._constants:
-                return self._constants[name]
-            raise SyntaxError(f"Undefined constant in expression: {name}")
-        if self._peek()[0] == "ORD":
-            return self._parse_ord()
-        raise SyntaxError(f"Unexpected token in expression factor: {self._peek()}")
+        handler = None
+        if self._pos < len(self._kinds):
+            handler = self._factor_dispatch.get(self._kinds[self._pos])
+        if handler is None:
+            raise SyntaxError(
+                f"Unexpected token in expression factor: {self._describe_token()}",
+            )
+        return handler()
+
+    def _parse_parenthesized(self) -> Any:
+        """Парсит подвыражение в скобках."""
+        self._expect(K_LPAREN)
+        value = self._parse_additive_expression()
+        self._expect(K_RPAREN)
+        return value
+
+    def _parse_factor_constant(self) -> Any:
+        """Парсит ссылку на константу внутри выражения."""
+        pos = self._pos
+        self._pos = pos + 1
+        return self._constant_value(pos, "Undefined constant in expression")
 
     def _parse_ord(self) -> int:
         """Парсит вызов функции ord()."""
-        self._expect("ORD")
-        self._expect("LPAREN")
-
-        token = self._peek()
-        if token[0] == "STRING":
-            value = self._consume("STRING")[1][2:-1]
-        elif token[0] == "ID":
-            const_name = self._consume("ID")[1]
-            if const_name in self._constants:
-                value = self._constants[const_name]
-            else:
-                raise SyntaxError(f"Undefined constant: {const_name}")
+        self._expect(K_ORD)
+        self._expect(K_LPAREN)
+
+        # Аргумент читается прямо из массивов токенов, без _peek/_consume
+        pos = self._pos
+        kind = self._kinds[pos] if pos < len(self._kinds) else None
+        if kind == K_STRING:
+            value = self._values[pos]
+        elif kind in _NAME_KINDS:
+            value = self._constant_value(pos, "Undefined constant")
         else:
             raise SyntaxError(
                 "ord() argument must be a string literal or a constant.",
             )
 
-        if not isinstance(value, str) or len(value) != 1:
+        if type(value) is not str or len(value) != 1:
             raise SyntaxError("ord() expects a single character string")
 
-        self._expect("RPAREN")
+        self._pos = pos + 1
+        self._expect(K_RPAREN)
         return ord(value)
 
 
+def _tokenize_stream(
+    stream: TextIO,
+    chunk_size: int = _STREAM_CHUNK_SIZE,
+) -> Iterator[tuple[list[int], list[Any]]]:
+    """
+    Читает поток блоками и разбивает его на токены по частям, не собирая
+    весь вход в одну строку.
+    Токен не может содержать перевод строки (строка `q(...)` тоже
+    заканчивается в пределах строки), поэтому текст режется после последнего
+    перевода строки в прочитанном, а остаток переносится в следующую часть.
+    Части разбирает `_tokenize_dfa`: размер потока заранее неизвестен,
+    а загрузка numba окупается только на десятках мегабайт.
+
+    :param stream: Текстовый поток, например sys.stdin.
+    :param chunk_size: Сколько символов читать за раз.
+    :return: Пары параллельных списков типов токенов и их значений.
+    """
+    pending: list[str] = []
+    while chunk := stream.read(chunk_size):
+        cut = chunk.rfind("\n") + 1
+        if not cut:
+            pending.append(chunk)
+            continue
+        pending.append(chunk[:cut])
+        part = "".join(pending)
+        pending = [chunk[cut:]]
+        yield Parser._tokenize_dfa(part)  # noqa: SLF001
+    part = "".join(pending)
+    if part:
+        yield Parser._tokenize_dfa(part)  # noqa: SLF001
+
+
+def parse_text(text: str) -> dict[str, Any]:
+    """
+    Преобразует текст на учебном конфигурационном языке в словарь.
+
+    :param text: Входной текст.
+    :return: Основной словарь конфигурации.
+    """
+    return Parser(text).parse()
+
+
+def write_output(result: dict[str, Any], output: str | Path | None) -> None:
+    """
+    Записывает результат в JSON.
+
+    :param result: Результат разбора.
+    :param output: Путь к выходному файлу. Если не задан, JSON выводится в stdout.
+    """
+    # json и pathlib импортируются здесь, а не при запуске: чтение stdin
+    # и разбор в них не нуждаются
+    import json  # noqa: PLC0415
+
+    if output:
+        from pathlib import Path  # noqa: PLC0415
+
+        with Path(output).open("w", encoding="utf-8") as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+    else:
+        print(json.dumps(result, indent=4, ensure_ascii=False))
+
+
+_USAGE = "usage: main.py [-h] [--output OUTPUT]"
+_HELP = f"""{_USAGE}
+
+Парсер учебного конфигурационного языка в JSON
+
+options:
+  -h, --help       show this help message and exit
+  --output OUTPUT  Путь для выходного JSON файла"""
+
+
+def _usage_error(message: str) -> NoReturn:
+    """Сообщает об ошибке в аргументах командной строки и завершает работу."""
+    sys.stderr.write(f"{_USAGE}\nmain.py: error: {message}\n")
+    sys.exit(2)
+
+
+def _parse_args(argv: list[str]) -> str | None:
+    """
+    Разбирает аргументы командной строки.
+    Ключ всего один, поэтому вместо argparse, импорт и настройка которого
+    заметно удлиняют запуск, аргументы перебираются вручную.
+
+    :param argv: Аргументы без имени программы.
+    :return: Путь для выходного JSON файла или None.
+    """
+    output = None
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-h", "--help"):
+            sys.stdout.write(f"{_HELP}\n")
+            sys.exit(0)
+        elif arg.startswith("--output="):
+            output = arg.split("=", 1)[1]
+        elif arg == "--output":
+            output = next(args, None)
+            if output is None:
+                _usage_error("argument --output: expected one argument")
+        else:
+            _usage_error(f"unrecognized arguments: {arg}")
+    return output
+
+
 def main() -> None:
-    parser = argparse.ArgumentParser(
-        description="Парсер учебного конфигурационного языка в JSON",
-    )
-    parser.add_argument(
-        "--output",
-        required=False,
-        help="Путь для выходного JSON файла",
-    )
-    args = parser.parse_args()
+    output = _parse_args(sys.argv[1:])
 
     try:
-        input_text = sys.stdin.read()
-        parser = Parser(input_text)
-        result = parser.parse()
-        if args.output:
-            with Path(args.output).open("w", encoding="utf-8") as f:
-                json.dump(result, f, indent=4, ensure_ascii=False)
-        else:
-            print(json.dumps(result, indent=4, ensure_ascii=False))
+        result = Parser(_tokenize_stream(sys.stdin)).parse()
+        write_output(result, output)
     except (SyntaxError, TypeError) as e:
         sys.stderr.write(f"Syntax error: {e}\n")
         sys.exit(1)
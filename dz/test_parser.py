@@ -1,14 +1,23 @@
+import functools
+import importlib.util
+import io
 import json
 import subprocess
 import sys
+from collections.abc import Callable
 from pathlib import Path
+from typing import Any
 
 import pytest
 
+from main import Parser, _parse_args, _tokenize_stream, parse_text, write_output
+
+MAIN_PATH = Path(__file__).parent / "main.py"
+
 
 def run_parser(input_data: str, output_file: Path) -> subprocess.CompletedProcess:
     return subprocess.run(  # noqa: S603
-        [sys.executable, "main.py", f"--output={output_file}"],
+        [sys.executable, MAIN_PATH, f"--output={output_file}"],
         check=False,
         input=input_data,
         capture_output=True,
@@ -19,8 +28,7 @@ def run_parser(input_data: str, output_file: Path) -> subprocess.CompletedProces
 
 def run_and_check(input_data: str, tmp_path: Path, expected_data: dict) -> None:
     output_file = tmp_path / "output.json"
-    process = run_parser(input_data, output_file)
-    assert process.returncode == 0
+    write_output(parse_text(input_data), output_file)
     with output_file.open() as f:
         data = json.load(f)
     assert data == expected_data
@@ -28,9 +36,9 @@ def run_and_check(input_data: str, tmp_path: Path, expected_data: dict) -> None:
 
 def run_and_check_error(input_data: str, tmp_path: Path, expected_error: str) -> None:
     output_file = tmp_path / "error_output.json"
-    process = run_parser(input_data, output_file)
-    assert process.returncode != 0
-    assert expected_error in process.stderr
+    with pytest.raises((SyntaxError, TypeError)) as exc_info:
+        write_output(parse_text(input_data), output_file)
+    assert expected_error in f"Syntax error: {exc_info.value}"
     assert not output_file.exists()
 
 
@@ -178,6 +186,19 @@ def test_string_multiplication(tmp_path: Path) -> None:
             """,
             {"C": 20},
         ),
+        (
+            """
+            A is 1
+            X is |A + 1|
+            A is 5
+            begin
+                B := |A + 1|;
+                C := X;
+                D := |A + 1|;
+            end
+            """,
+            {"B": 6, "C": 2, "D": 6},
+        ),
         ("begin end", {}),
         ("", {}),
         (
@@ -245,3 +266,157 @@ def test_advanced_features(
 )
 def test_invalid_syntax(input_data: str, expected_error: str, tmp_path: Path) -> None:
     run_and_check_error(input_data, tmp_path, expected_error)
+
+
+def test_cli(tmp_path: Path) -> None:
+    output_file = tmp_path / "output.json"
+    process = run_parser("X is 2\nbegin A := |X * 3|; end", output_file)
+    assert process.returncode == 0
+    with output_file.open() as f:
+        data = json.load(f)
+    assert data == {"A": 6}
+
+
+def test_cli_error(tmp_path: Path) -> None:
+    output_file = tmp_path / "error_output.json"
+    process = run_parser("begin @ end", output_file)
+    assert process.returncode != 0
+    assert "Syntax error: Unexpected character: @" in process.stderr
+    assert not output_file.exists()
+
+
+@pytest.mark.parametrize(
+    ("argv", "expected_output"),
+    [
+        ([], None),
+        (["--output", "out.json"], "out.json"),
+        (["--output=out.json"], "out.json"),
+        (["--output=a.json", "--output", "b.json"], "b.json"),
+    ],
+)
+def test_parse_args(argv: list[str], expected_output: str | None) -> None:
+    assert _parse_args(argv) == expected_output
+
+
+@pytest.mark.parametrize(
+    ("argv", "expected_error"),
+    [
+        (["--output"], "argument --output: expected one argument"),
+        (["--out=x.json"], "unrecognized arguments: --out=x.json"),
+        (["out.json"], "unrecognized arguments: out.json"),
+    ],
+)
+def test_parse_args_error(
+    argv: list[str],
+    expected_error: str,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    with pytest.raises(SystemExit) as exc_info:
+        _parse_args(argv)
+    assert exc_info.value.code == 2  # noqa: PLR2004
+    stderr = capsys.readouterr().err
+    assert stderr.startswith("usage: main.py")
+    assert expected_error in stderr
+
+
+@pytest.mark.parametrize("flag", ["-h", "--help"])
+def test_parse_args_help(flag: str, capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit) as exc_info:
+        _parse_args([flag, "--output"])
+    assert exc_info.value.code == 0
+    stdout = capsys.readouterr().out
+    assert stdout.startswith("usage: main.py")
+    assert "--output OUTPUT" in stdout
+
+
+TOKENIZER_INPUTS = [
+    "begin NAME := q(John); AGE := -25; end",
+    "CHAR is q(()\nbegin A := |ord(CHAR) * 2 + 1|; end",
+    "begin A := q(a\nb); end",
+    "begin A := 1; # comment end",
+    "A is1 beginX := +7;end",
+    "begin A := q(a()|;b); end",
+    "X is q(a b;c)\nY is 12\nbegin\n  A := |X + q(d)|;\n  B := |Y * 3|;\nend\n",
+]
+
+
+def requires(module: str) -> pytest.MarkDecorator:
+    return pytest.mark.skipif(
+        importlib.util.find_spec(module) is None,
+        reason=f"{module} is not installed",
+    )
+
+
+def tokenize_stream(text: str, chunk_size: int) -> tuple[list[int], list[Any]]:
+    kinds: list[int] = []
+    values: list[Any] = []
+    for part_kinds, part_values in _tokenize_stream(io.StringIO(text), chunk_size):
+        kinds += part_kinds
+        values += part_values
+    return kinds, values
+
+
+def tokenize(
+    tokenizer: Callable[[str], tuple[list[int], list[Any]]],
+    input_data: str,
+) -> tuple[list[int], list[Any]] | str:
+    try:
+        return tokenizer(input_data)
+    except SyntaxError as e:
+        return str(e)
+
+
+@pytest.mark.parametrize(
+    "tokenizer",
+    [
+        pytest.param(Parser._tokenize_dfa, id="dfa"),  # noqa: SLF001
+        pytest.param(
+            Parser._tokenize_numba,  # noqa: SLF001
+            id="numba",
+            marks=requires("numba"),
+        ),
+        *(
+            pytest.param(
+                functools.partial(tokenize_stream, chunk_size=chunk_size),
+                id=f"stream-{chunk_size}",
+            )
+            for chunk_size in (1, 4, 1 << 16)
+        ),
+    ],
+)
+@pytest.mark.parametrize("input_data", TOKENIZER_INPUTS)
+def test_tokenizers_agree(
+    tokenizer: Callable[[str], tuple[list[int], list[Any]]],
+    input_data: str,
+) -> None:
+    expected = tokenize(Parser._tokenize, input_data)  # noqa: SLF001
+    assert tokenize(tokenizer, input_data) == expected
+
+
+def parse_outcome(
+    input_data: str,
+    *,
+    use_cython: bool,
+) -> dict[str, Any] | tuple[str, str]:
+    try:
+        return Parser(input_data, use_cython=use_cython).parse()
+    except (SyntaxError, TypeError) as e:
+        return type(e).__name__, str(e)
+
+
+@pytest.mark.parametrize(
+    "input_data",
+    [
+        *TOKENIZER_INPUTS,
+        "X is 2\nX is |X * 3|\nbegin A := |X + 1|; B := begin C := X; end; end",
+        "S is q(ab)\nbegin A := |S * 2 + q(c)|; B := |(1 - 4) * 2|; end",
+        "begin A := |q(a) - q(b)|; end",
+        "begin A := |ord(X)|; end",
+        "begin A := begin B := 1; end end",
+        "X is 1 X",
+    ],
+)
+@requires("_parser")
+def test_cython_parser_agrees(input_data: str) -> None:
+    expected = parse_outcome(input_data, use_cython=False)
+    assert parse_outcome(input_data, use_cython=True) == expected